@@ -1,3 +1,4 @@
+from .dependencies import get_gemini_service, get_linkedin_service
 from .jobs import router as jobs_router
 
-__all__ = ['jobs_router']
\ No newline at end of file
+__all__ = ['jobs_router', 'get_linkedin_service', 'get_gemini_service']
\ No newline at end of file
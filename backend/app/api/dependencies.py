@@ -0,0 +1,34 @@
+from typing import Optional
+from app.services.gemini_service import GeminiService, close_genai
+from app.services.linkedin_service import LinkedInService
+
+# Built once at startup and shared by every router, so caches and clients are shared too
+_linkedin_service: Optional[LinkedInService] = None
+_gemini_service: Optional[GeminiService] = None
+
+def init_services() -> None:
+    """Create the shared service instances."""
+    get_linkedin_service()
+    get_gemini_service()
+
+async def close_services() -> None:
+    """Close the Gemini channel the services share and drop the instances."""
+    global _linkedin_service, _gemini_service
+    # LinkedInService has nothing of its own to close; the shared HTTP session is closed separately
+    await close_genai()
+    _linkedin_service = None
+    _gemini_service = None
+
+def get_linkedin_service() -> LinkedInService:
+    """Dependency returning the shared LinkedIn service."""
+    global _linkedin_service
+    if _linkedin_service is None:
+        _linkedin_service = LinkedInService()
+    return _linkedin_service
+
+def get_gemini_service() -> GeminiService:
+    """Dependency returning the shared Gemini service."""
+    global _gemini_service
+    if _gemini_service is None:
+        _gemini_service = GeminiService()
+    return _gemini_service
@@ -0,0 +1,35 @@
+import functools
+import logging
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from app.services.linkedin_service import RateLimitError
+
+logger = logging.getLogger(__name__)
+
+LINKEDIN_RATE_LIMIT_DETAIL = "LinkedIn is rate limiting requests. Please wait a few minutes before trying again."
+
+def handle_upstream_errors(retry_after: int = 60, detail: str = LINKEDIN_RATE_LIMIT_DETAIL):
+    """
+    Turn a LinkedIn RateLimitError raised while handling a request into a 429
+    response with Retry-After and X-RateLimit-* headers.
+    Gemini quota errors are mapped to 429 by GeminiService and pass through untouched.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except RateLimitError as e:
+                reset_time = datetime.now() + timedelta(seconds=retry_after)
+                logger.warning("Rate limit hit in %s: %s. Retry after %ss", func.__name__, e, retry_after)
+                raise HTTPException(
+                    status_code=429,
+                    detail=detail,
+                    headers={
+                        "Retry-After": str(retry_after),
+                        "X-RateLimit-Reset": str(int(reset_time.timestamp())),
+                        "X-RateLimit-Remaining": "0"
+                    }
+                )
+        return wrapper
+    return decorator
@@ -1,22 +1,49 @@
-from fastapi import APIRouter, HTTPException, Body, Response
+from fastapi import APIRouter, Depends, HTTPException, Body, Request, Response
+from app.api.dependencies import get_gemini_service, get_linkedin_service
+from app.api.errors import handle_upstream_errors
 from app.models.base import JobSearchRequest, JobSearchResponse
-from app.services.linkedin_service import LinkedInService
-from app.services.gemini_service import GeminiService
-from typing import Dict
-import asyncio
-from datetime import datetime, timedelta
+from app.services.coalesce import get_or_create_future
+from app.services.gemini_service import GeminiService, content_key
+from app.services.linkedin_service import LinkedInService, RateLimitError, extract_job_id
+from typing import Dict, Optional
+import hashlib
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-linkedin_service = LinkedInService()
-gemini_service = GeminiService()
+
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """Check an If-None-Match header against our ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip() for tag in if_none_match.split(","))
+
+def _cacheable_response(body: bytes, raw_request: Request, cache_time: int) -> Response:
+    """
+    Build a JSON response with cache headers and a weak ETag.
+    Returns 304 Not Modified when the client already has this body.
+    """
+    etag = 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={cache_time}",
+        "Vary": "Accept-Encoding",
+        "X-Cache-TTL": str(cache_time)
+    }
+    if _etag_matches(etag, raw_request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.post("/search", response_model=JobSearchResponse)
+@handle_upstream_errors(retry_after=60)
 async def search_jobs(
+    raw_request: Request,
     request: JobSearchRequest = Body(...),
-    response: Response = None
+    linkedin_service: LinkedInService = Depends(get_linkedin_service)
 ) -> JobSearchResponse:
     """
     Search for jobs on LinkedIn with pagination support.
@@ -29,119 +56,75 @@ async def search_jobs(
                 detail="Keywords are required for job search"
             )
 
-        logger.info(f"Searching jobs: keywords='{request.keywords}', location='{request.location}', page={request.page}")
-        
-        # Add small delay to prevent rapid requests
-        await asyncio.sleep(1)
+        logger.info("Searching jobs: keywords='%s', location='%s', page=%s", request.keywords, request.location, request.page)
         
-        # Set cache headers
-        if response:
-            cache_time = 300  # 5 minutes
-            response.headers.update({
-                "Cache-Control": f"public, max-age={cache_time}",
-                "Vary": "Accept-Encoding",
-                "X-Cache-TTL": str(cache_time)
-            })
-        
-        result = await linkedin_service.search_jobs(request)
+        # Identical concurrent searches share a single upstream fetch
+        result = await get_or_create_future(
+            f"search:{request.model_dump_json()}",
+            lambda: linkedin_service.search_jobs(request)
+        )
         
-        logger.info(f"Found {len(result.jobs)} jobs for keywords='{request.keywords}'")
+        logger.info("Found %d jobs for keywords='%s'", len(result.jobs), request.keywords)
         
         # If no jobs found, return empty response instead of error
         if not result.jobs:
-            return JobSearchResponse(jobs=[], total=0, has_more=False)
+            result = JobSearchResponse(jobs=[], total=0, has_more=False)
             
-        return result
+        return _cacheable_response(orjson.dumps(result.model_dump()), raw_request, cache_time=300)  # 5 minutes
         
+    except (HTTPException, RateLimitError):
+        raise
     except Exception as e:
-        error_msg = str(e).lower()
-        if "rate limit" in error_msg or "too many requests" in error_msg:
-            retry_after = 60
-            reset_time = datetime.now() + timedelta(minutes=1)
-            
-            logger.warning(f"Rate limit hit for keywords='{request.keywords}'. Retry after {retry_after}s")
-            
-            # Set retry headers
-            if response:
-                response.headers.update({
-                    "Retry-After": str(retry_after),
-                    "X-RateLimit-Reset": str(int(reset_time.timestamp())),
-                    "X-RateLimit-Remaining": "0"
-                })
-            raise HTTPException(
-                status_code=429,
-                detail="LinkedIn is rate limiting requests. Please wait a few minutes before trying again."
-            )
-            
-        logger.error(f"Error searching jobs: {str(e)}", exc_info=True)
+        logger.error("Error searching jobs: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Error searching jobs: {str(e)}"
         )
 
 @router.get("/{job_id}/description")
+@handle_upstream_errors(retry_after=60)
 async def get_job_description(
     job_id: str,
-    response: Response = None
+    raw_request: Request,
+    linkedin_service: LinkedInService = Depends(get_linkedin_service)
 ) -> str:
     """Get the full description for a specific job."""
     try:
-        logger.info(f"Fetching description for job_id={job_id}")
+        logger.info("Fetching description for job_id=%s", job_id)
         
-        # Add small delay to prevent rapid requests
-        await asyncio.sleep(1)
-        
-        # Set cache headers for longer caching of descriptions
-        if response:
-            cache_time = 3600  # 1 hour
-            response.headers.update({
-                "Cache-Control": f"public, max-age={cache_time}",
-                "Vary": "Accept-Encoding",
-                "X-Cache-TTL": str(cache_time)
-            })
-        
-        description = await linkedin_service.get_job_description(job_id)
+        description = await get_or_create_future(
+            f"desc:{job_id}",
+            lambda: linkedin_service.get_job_description(job_id)
+        )
         
         if not description:
-            logger.warning(f"No description found for job_id={job_id}")
+            logger.warning("No description found for job_id=%s", job_id)
             raise HTTPException(
                 status_code=404,
                 detail="Job description not found"
             )
             
-        logger.info(f"Successfully fetched description for job_id={job_id} (length={len(description)})")
-        return description
+        logger.info("Successfully fetched description for job_id=%s (length=%d)", job_id, len(description))
+        # Longer caching for descriptions
+        return _cacheable_response(orjson.dumps(description), raw_request, cache_time=3600)  # 1 hour
         
+    except (HTTPException, RateLimitError):
+        raise
     except Exception as e:
-        error_msg = str(e).lower()
-        if "rate limit" in error_msg or "too many requests" in error_msg:
-            retry_after = 60
-            reset_time = datetime.now() + timedelta(minutes=1)
-            
-            logger.warning(f"Rate limit hit for job_id={job_id}. Retry after {retry_after}s")
-            
-            # Set retry headers
-            if response:
-                response.headers.update({
-                    "Retry-After": str(retry_after),
-                    "X-RateLimit-Reset": str(int(reset_time.timestamp())),
-                    "X-RateLimit-Remaining": "0"
-                })
-            raise HTTPException(
-                status_code=429,
-                detail="LinkedIn is rate limiting requests. Please wait a few minutes before trying again."
-            )
-            
-        logger.error(f"Error fetching description: {str(e)}", exc_info=True)
+        logger.error("Error fetching description: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching job description: {str(e)}"
         )
 
 @router.post("/optimize")
+# LinkedIn throttling gets a longer hint here; Gemini quota errors arrive as 429s from GeminiService
+@handle_upstream_errors(retry_after=300)
 async def optimize_resume(
     data: Dict[str, str] = Body(...),
-    response: Response = None
+    response: Response = None,
+    linkedin_service: LinkedInService = Depends(get_linkedin_service),
+    gemini_service: GeminiService = Depends(get_gemini_service)
 ) -> str:
     """
     Optimize resume for a specific job listing.
@@ -154,11 +137,14 @@ async def optimize_resume(
                 detail="Job URL is required"
             )
             
-        job_id = data["url"].split("/")[-1].split("?")[0]
-        logger.info(f"Optimizing resume for job_id={job_id}")
-        
-        # Add small delay to prevent rapid requests
-        await asyncio.sleep(1)
+        try:
+            job_id = extract_job_id(data["url"])
+        except ValueError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=str(e)
+            )
+        logger.info("Optimizing resume for job_id=%s", job_id)
         
         # No caching for optimization results
         if response:
@@ -167,40 +153,29 @@ async def optimize_resume(
                 "Pragma": "no-cache"
             })
         
-        description = await linkedin_service.get_job_description(job_id)
+        description = await get_or_create_future(
+            f"desc:{job_id}",
+            lambda: linkedin_service.get_job_description(job_id)
+        )
         
         if not description:
-            logger.warning(f"No description found for job_id={job_id} during optimization")
+            logger.warning("No description found for job_id=%s during optimization", job_id)
             raise HTTPException(
                 status_code=404,
                 detail="Job description not found"
             )
             
-        logger.info(f"Optimizing resume with description (length={len(description)})")
-        optimization = await gemini_service.optimize_resume(description)
+        logger.info("Optimizing resume with description (length=%d)", len(description))
+        optimization = await get_or_create_future(
+            f"optimize:{content_key(description)}",
+            lambda: gemini_service.optimize_resume(description)
+        )
         return optimization
         
+    except (HTTPException, RateLimitError):
+        raise
     except Exception as e:
-        error_msg = str(e).lower()
-        if "rate limit" in error_msg or "too many requests" in error_msg:
-            retry_after = 300  # 5 minutes
-            reset_time = datetime.now() + timedelta(minutes=5)
-            
-            logger.warning(f"Rate limit hit during optimization for job_id={job_id}. Retry after {retry_after}s")
-            
-            # Set retry headers
-            if response:
-                response.headers.update({
-                    "Retry-After": str(retry_after),
-                    "X-RateLimit-Reset": str(int(reset_time.timestamp())),
-                    "X-RateLimit-Remaining": "0"
-                })
-            raise HTTPException(
-                status_code=429,
-                detail="Service is rate limited. Please wait a few minutes."
-            )
-            
-        logger.error(f"Error optimizing resume: {str(e)}", exc_info=True)
+        logger.error("Error optimizing resume: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Error optimizing resume: {str(e)}"
@@ -1,33 +1,194 @@
-from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Response
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from typing import IO, AsyncIterator, Optional
 from datetime import datetime
 import io
 import os
-import docx
-from docx.text.paragraph import Paragraph
-from docx.shared import Pt, RGBColor
+import shutil
+import tempfile
+import time
+import orjson
 
+from app.api.dependencies import get_gemini_service, get_linkedin_service
+from app.api.errors import handle_upstream_errors
 from app.models.base import ResumeOptimizationRequest, ResumeOptimizationResponse
-from app.services.gemini_service import GeminiService
-from app.services.linkedin_service import LinkedInService
+from app.services.docx_parser import apply_position_updates, extract_document_text, read_main_document, run_in_docx_pool
+from app.services.gemini_service import GeminiService, content_key
+from app.services.linkedin_service import LinkedInService, RateLimitError, extract_job_id
+from app.services.coalesce import get_or_create_future
 
 router = APIRouter()
-gemini_service = GeminiService()
-linkedin_service = LinkedInService()
+
+# Largest DOCX upload accepted; bigger files are rejected before they are parsed
+MAX_DOCX_BYTES = 10 * 1024 * 1024
+
+# Last formatted timestamp, keyed by 10ms bucket
+_created_at_cache = (0, "")
+
+def _created_at() -> str:
+    """Current time in ISO format, formatted at most once per 10ms."""
+    global _created_at_cache
+    bucket = time.time_ns() // 10_000_000
+    if _created_at_cache[0] != bucket:
+        _created_at_cache = (bucket, datetime.fromtimestamp(bucket / 100).isoformat(timespec='microseconds'))
+    return _created_at_cache[1]
+
+def _sse(data: object, event: Optional[str] = None) -> bytes:
+    """Encode one server-sent event with a JSON payload."""
+    prefix = f"event: {event}\n".encode() if event else b""
+    return prefix + b"data: " + orjson.dumps(data) + b"\n\n"
+
+async def _stream_events(chunks: AsyncIterator[str], optimization_id: str) -> AsyncIterator[bytes]:
+    """Relay Gemini text chunks as events, ending with a done or error event."""
+    try:
+        async for chunk in chunks:
+            yield _sse(chunk)
+    except HTTPException as e:
+        yield _sse({"detail": str(e.detail), "status_code": e.status_code}, event="error")
+        return
+    except Exception as e:
+        yield _sse({"detail": f"Resume optimization failed: {str(e)}", "status_code": 500}, event="error")
+        return
+    yield _sse({"optimization_id": optimization_id, "created_at": _created_at()}, event="done")
+
+def _event_stream_response(chunks: AsyncIterator[str], optimization_id: str) -> StreamingResponse:
+    return StreamingResponse(
+        _stream_events(chunks, optimization_id),
+        media_type="text/event-stream",
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Stop proxies from holding events back
+        }
+    )
+
+def _copy_to_path(source: IO[bytes], path: str) -> None:
+    """Copy a spooled upload to a file on disk."""
+    source.seek(0)
+    with open(path, 'wb') as target:
+        shutil.copyfileobj(source, target)
+
+async def _check_upload_size(resume: UploadFile) -> None:
+    """Reject uploads larger than MAX_DOCX_BYTES with a 413."""
+    size = resume.size
+    if size is None:
+        # Size is unknown for some clients; the spooled file knows its length
+        size = await run_in_threadpool(resume.file.seek, 0, io.SEEK_END)
+        await resume.seek(0)
+    if size > MAX_DOCX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Resume file is too large (max {MAX_DOCX_BYTES // (1024 * 1024)} MB)"
+        )
+
+async def _read_resume_upload(resume: UploadFile) -> str:
+    """Validate an uploaded DOCX resume and extract its text."""
+    # Validate resume file
+    if not resume.filename:
+        raise HTTPException(
+            status_code=400,
+            detail="No file provided"
+        )
+
+    if not resume.filename.endswith(('.docx', '.doc')):
+        raise HTTPException(
+            status_code=400,
+            detail="Only .doc and .docx files are supported"
+        )
+
+    await _check_upload_size(resume)
+
+    # Read resume content straight from the spooled upload, pulling out only the document XML
+    try:
+        await resume.seek(0)
+        if not await resume.read(1):
+            raise ValueError("Empty file")
+        await resume.seek(0)
+
+        document_xml = await run_in_threadpool(read_main_document, resume.file)
+        resume_text = await run_in_docx_pool(extract_document_text, document_xml)
+
+        if not resume_text:
+            raise ValueError("No text content found in document")
+
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error reading document: {str(e)}"
+        )
+
+    return resume_text
+
+async def _resolve_job_description(
+    job_description: str,
+    job_url: str,
+    linkedin_service: LinkedInService
+) -> str:
+    """Use the given job description, or fetch it when a LinkedIn job URL is provided."""
+    # Handle job details
+    if job_url:
+        try:
+            # Basic URL validation
+            if not job_url.startswith(('http://', 'https://')):
+                raise ValueError("Invalid URL format")
+
+            if 'linkedin.com/jobs' not in job_url:
+                raise ValueError("Not a LinkedIn job URL")
+
+            # Extract and validate job ID
+            job_id = extract_job_id(job_url)
+
+            # Fetch job description
+            job_description = await get_or_create_future(
+                f"desc:{job_id}",
+                lambda: linkedin_service.get_job_description(job_id)
+            )
+            if not job_description:
+                raise ValueError("Could not fetch job description")
+
+        except ValueError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=str(e)
+            )
+
+    # Validate we have either job description or URL
+    if not job_description and not job_url:
+        raise HTTPException(
+            status_code=400,
+            detail="Either job description or job URL is required"
+        )
+
+    return job_description
 
 @router.post("/resume", response_model=ResumeOptimizationResponse)
-async def optimize_resume(request: ResumeOptimizationRequest) -> ResumeOptimizationResponse:
+async def optimize_resume(
+    request: ResumeOptimizationRequest,
+    gemini_service: GeminiService = Depends(get_gemini_service)
+) -> ResumeOptimizationResponse:
     """
     Optimize resume based on a job description.
     """
     try:
-        suggestions = await gemini_service.optimize_resume(request.job_description, request.resume_text)
+        optimization_id = content_key(request.job_description, request.resume_text)
+        suggestions = await get_or_create_future(
+            f"optimize:{optimization_id}",
+            lambda: gemini_service.optimize_resume(request.job_description, request.resume_text)
+        )
         return ResumeOptimizationResponse(
             original_resume=request.resume_text,
             optimized_resume=suggestions,
-            optimization_id=str(hash(request.resume_text + request.job_description)),
-            created_at=datetime.now().isoformat()
+            optimization_id=optimization_id,
+            created_at=_created_at()
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -35,16 +196,31 @@ async def optimize_resume(request: ResumeOptimizationRequest) -> ResumeOptimizat
         )
 
 @router.post("/resume/url", response_model=ResumeOptimizationResponse)
-async def optimize_resume_from_url(resume_text: str, job_url: str) -> ResumeOptimizationResponse:
+@handle_upstream_errors(retry_after=60)
+async def optimize_resume_from_url(
+    resume_text: str,
+    job_url: str,
+    linkedin_service: LinkedInService = Depends(get_linkedin_service),
+    gemini_service: GeminiService = Depends(get_gemini_service)
+) -> ResumeOptimizationResponse:
     """
     Optimize resume based on a LinkedIn job URL.
     """
     try:
         # Get job ID from URL
-        job_id = job_url.split('/')[-1].split('?')[0]
+        try:
+            job_id = extract_job_id(job_url)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=str(e)
+            )
         
         # Fetch job description
-        description = await linkedin_service.get_job_description(job_id)
+        description = await get_or_create_future(
+            f"desc:{job_id}",
+            lambda: linkedin_service.get_job_description(job_id)
+        )
         if not description:
             raise HTTPException(
                 status_code=404,
@@ -52,14 +228,20 @@ async def optimize_resume_from_url(resume_text: str, job_url: str) -> ResumeOpti
             )
 
         # Generate optimization suggestions
-        suggestions = await gemini_service.optimize_resume(description, resume_text)
+        optimization_id = content_key(description, resume_text)
+        suggestions = await get_or_create_future(
+            f"optimize:{optimization_id}",
+            lambda: gemini_service.optimize_resume(description, resume_text)
+        )
         
         return ResumeOptimizationResponse(
             original_resume=resume_text,
             optimized_resume=suggestions,
-            optimization_id=str(hash(resume_text + description)),
-            created_at=datetime.now().isoformat()
+            optimization_id=optimization_id,
+            created_at=_created_at()
         )
+    except (HTTPException, RateLimitError):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -67,104 +249,47 @@ async def optimize_resume_from_url(resume_text: str, job_url: str) -> ResumeOpti
         )
 
 @router.post("/resume/docx", response_model=ResumeOptimizationResponse)
+@handle_upstream_errors(retry_after=60)
 async def optimize_resume_from_docx(
     resume: UploadFile = File(...),
     job_description: str = Form(""),
-    job_url: str = Form("")
+    job_url: str = Form(""),
+    linkedin_service: LinkedInService = Depends(get_linkedin_service),
+    gemini_service: GeminiService = Depends(get_gemini_service)
 ) -> ResumeOptimizationResponse:
     """
     Optimize resume from a DOCX file based on a job description or URL.
     """
     try:
-        # Validate resume file
-        if not resume.filename:
-            raise HTTPException(
-                status_code=400,
-                detail="No file provided"
-            )
-
-        if not resume.filename.endswith(('.docx', '.doc')):
-            raise HTTPException(
-                status_code=400,
-                detail="Only .doc and .docx files are supported"
-            )
-
-        # Read resume content
-        try:
-            content = await resume.read()
-            if not content:
-                raise ValueError("Empty file")
-            
-            doc = docx.Document(io.BytesIO(content))
-            resume_text = "\n".join([p.text for p in doc.paragraphs if p.text.strip()])
-            
-            if not resume_text:
-                raise ValueError("No text content found in document")
-                
-        except ValueError as e:
-            raise HTTPException(
-                status_code=400,
-                detail=str(e)
-            )
-        except Exception as e:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Error reading document: {str(e)}"
-            )
-
-        # Handle job details
-        if job_url:
-            try:
-                # Basic URL validation
-                if not job_url.startswith(('http://', 'https://')):
-                    raise ValueError("Invalid URL format")
-                    
-                if 'linkedin.com/jobs' not in job_url:
-                    raise ValueError("Not a LinkedIn job URL")
-                
-                # Extract and validate job ID
-                job_id = job_url.split('/')[-1].split('?')[0]
-                if not job_id.strip() or not job_id.isdigit():
-                    raise ValueError("Invalid job ID in URL")
-                
-                # Fetch job description
-                job_description = await linkedin_service.get_job_description(job_id)
-                if not job_description:
-                    raise ValueError("Could not fetch job description")
-                    
-            except ValueError as e:
-                raise HTTPException(
-                    status_code=400,
-                    detail=str(e)
-                )
-        
-        # Validate we have either job description or URL
-        if not job_description and not job_url:
-            raise HTTPException(
-                status_code=400,
-                detail="Either job description or job URL is required"
-            )
+        resume_text = await _read_resume_upload(resume)
+        job_description = await _resolve_job_description(job_description, job_url, linkedin_service)
 
         # Generate optimization suggestions
         try:
-            suggestions = await gemini_service.optimize_resume(job_description, resume_text)
+            optimization_id = content_key(job_description, resume_text)
+            suggestions = await get_or_create_future(
+                f"optimize:{optimization_id}",
+                lambda: gemini_service.optimize_resume(job_description, resume_text)
+            )
             if not suggestions:
                 raise ValueError("Failed to generate optimization suggestions")
                 
             return ResumeOptimizationResponse(
                 original_resume=resume_text,
                 optimized_resume=suggestions,
-                optimization_id=str(hash(resume_text + job_description)),
-                created_at=datetime.now().isoformat()
+                optimization_id=optimization_id,
+                created_at=_created_at()
             )
             
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to optimize resume: {str(e)}"
             )
             
-    except HTTPException:
+    except (HTTPException, RateLimitError):
         raise
     except Exception as e:
         raise HTTPException(
@@ -172,6 +297,34 @@ async def optimize_resume_from_docx(
             detail=f"Unexpected error: {str(e)}"
         )
 
+@router.post("/resume/stream")
+async def optimize_resume_stream(
+    request: ResumeOptimizationRequest,
+    gemini_service: GeminiService = Depends(get_gemini_service)
+) -> StreamingResponse:
+    """
+    Optimize resume based on a job description, streaming suggestions as server-sent events.
+    """
+    chunks = gemini_service.optimize_resume_stream(request.job_description, request.resume_text)
+    return _event_stream_response(chunks, content_key(request.job_description, request.resume_text))
+
+@router.post("/resume/docx/stream")
+@handle_upstream_errors(retry_after=60)
+async def optimize_resume_from_docx_stream(
+    resume: UploadFile = File(...),
+    job_description: str = Form(""),
+    job_url: str = Form(""),
+    linkedin_service: LinkedInService = Depends(get_linkedin_service),
+    gemini_service: GeminiService = Depends(get_gemini_service)
+) -> StreamingResponse:
+    """
+    Optimize resume from a DOCX file, streaming suggestions as server-sent events.
+    """
+    resume_text = await _read_resume_upload(resume)
+    job_description = await _resolve_job_description(job_description, job_url, linkedin_service)
+    chunks = gemini_service.optimize_resume_stream(job_description, resume_text)
+    return _event_stream_response(chunks, content_key(job_description, resume_text))
+
 @router.post("/resume/export")
 async def export_resume(
     resume: UploadFile = File(...),
@@ -181,115 +334,33 @@ async def export_resume(
     Create a new resume file with the optimized content.
     """
     try:
-        content = await resume.read()
-        doc = docx.Document(io.BytesIO(content))
-        
-        # Parse position updates
-        position_updates = {}
-        current_position = None
-        parsing_updates = False
-        
-        for line in suggestions.split('\n'):
-            line = line.strip()
-            if not line:
-                continue
-            
-            if line == "POSITION_UPDATES:":
-                parsing_updates = True
-                continue
-            
-            if not parsing_updates:
-                continue
-                
-            if line.startswith('-'):
-                if current_position:
-                    position_updates.setdefault(current_position, []).append(line[1:].strip())
-            else:
-                current_position = line
-
-        # Process document
-        processed_positions = set()
-        in_position = False
-        current_position = None
-        bullet_index = 0
-        updates_made = False
-
-        for paragraph in doc.paragraphs:
-            text = paragraph.text.strip()
-            if not text:
-                continue
-
-            # Check for position titles
-            is_position = False
-            if '|' in text and any(month in text for month in ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']):
-                is_position = True
-
-            # Process position titles
-            if is_position:
-                position_key = text.split('|')[0].strip().lower()
-                for update_position in position_updates.keys():
-                    if update_position.split('|')[0].strip().lower() == position_key and update_position not in processed_positions:
-                        current_position = update_position
-                        in_position = True
-                        bullet_index = 0
-                        processed_positions.add(update_position)
-                        break
-
-            # Update bullet points
-            if in_position and bullet_index < len(position_updates.get(current_position, [])):
-                if text.startswith('•') or any(word in text.lower() for word in ['increased', 'decreased', 'improved', 'achieved', 'launched', 'created', 'developed', 'implemented', 'managed', 'led']):
-                    # Get original formatting
-                    original_format = None
-                    if paragraph.runs:
-                        run = paragraph.runs[0]
-                        original_format = {
-                            'name': run.font.name or 'Arial',
-                            'size': run.font.size,
-                            'color': run.font.color.rgb if run.font.color else RGBColor(0, 0, 0)
-                        }
-                    
-                    # Preserve bullet point
-                    bullet = '• ' if text.startswith('•') else ''
-                    
-                    # Update content
-                    new_content = position_updates[current_position][bullet_index]
-                    paragraph.clear()
-                    
-                    # Add bullet if needed
-                    if bullet:
-                        run = paragraph.add_run(bullet)
-                        if original_format:
-                            run.font.name = original_format['name']
-                            run.font.size = original_format['size']
-                            if original_format['color']:
-                                run.font.color.rgb = original_format['color']
-                    
-                    # Add content
-                    run = paragraph.add_run(new_content.lstrip('• '))
-                    if original_format:
-                        run.font.name = original_format['name']
-                        run.font.size = original_format['size']
-                        if original_format['color']:
-                            run.font.color.rgb = original_format['color']
-                    
-                    bullet_index += 1
-                    updates_made = True
-
-        # Save to memory
-        output = io.BytesIO()
-        doc.save(output)
-        output.seek(0)
-        
-        return Response(
-            content=output.read(),
+        await _check_upload_size(resume)
+
+        # The worker reads and writes files on disk, so neither document is held in memory here
+        workdir = await run_in_threadpool(tempfile.mkdtemp, prefix='resume-export-')
+        try:
+            source_path = os.path.join(workdir, 'resume.docx')
+            target_path = os.path.join(workdir, 'optimized_resume.docx')
+            await run_in_threadpool(_copy_to_path, resume.file, source_path)
+            await run_in_docx_pool(apply_position_updates, source_path, target_path, suggestions)
+        except BaseException:
+            await run_in_threadpool(shutil.rmtree, workdir, ignore_errors=True)
+            raise
+
+        # The file is streamed in chunks and removed once it has been sent
+        return FileResponse(
+            target_path,
             media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
             headers={
                 'Content-Disposition': 'attachment; filename=optimized_resume.docx'
-            }
+            },
+            background=BackgroundTask(shutil.rmtree, workdir, ignore_errors=True)
         )
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to export resume: {str(e)}"
-        )
\ No newline at end of file
+        )
@@ -1,5 +1,6 @@
+from functools import lru_cache
 from typing import List
-from pydantic import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     app_name: str = "LinkedIn Resume Optimizer"
@@ -18,9 +19,8 @@ class Settings(BaseSettings):
     allowed_headers: List[str] = ["*"]
     allow_credentials: bool = True
 
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
+@lru_cache()
 def get_settings() -> Settings:
     return Settings()
\ No newline at end of file
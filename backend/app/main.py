@@ -1,21 +1,48 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder
 from dotenv import load_dotenv
+import asyncio
 import os
 import time
 
 # Import routers
 from app.api import jobs, optimize
+from app.api.dependencies import close_services, get_gemini_service, init_services
+from app.services import http
+from app.services.docx_parser import get_docx_pool, shutdown_docx_pool
 
 # Load environment variables
 load_dotenv()
 
+# Share one HTTP connection pool, one DOCX worker pool and one set of services across all requests
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    http.get_session()
+    get_docx_pool()
+    init_services()
+    # Connect to Gemini in the background so startup is not held up by it
+    gemini_warm_up = asyncio.create_task(get_gemini_service().warm_up())
+    try:
+        yield
+    finally:
+        gemini_warm_up.cancel()
+        await close_services()
+        await http.close_session()
+        # Let in-flight DOCX jobs finish without blocking the event loop while they do
+        await asyncio.get_running_loop().run_in_executor(None, shutdown_docx_pool)
+
 # Create FastAPI app
 app = FastAPI(
     title="LinkedIn Resume Optimizer API",
     description="API for LinkedIn job search and resume optimization",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -39,19 +66,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Event streams would be buffered until the end, and DOCX files are already zip-compressed
+_UNCOMPRESSED_CONTENT_TYPES = ("text/event-stream", "application/vnd.openxmlformats-")
+
+class _ContentTypeGZipResponder(GZipResponder):
+    async def send_with_gzip(self, message):
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if content_type.startswith(_UNCOMPRESSED_CONTENT_TYPES):
+                # Sent through unchanged, the same way as an already encoded body
+                self.content_encoding_set = True
+
+class StreamAwareGZipMiddleware(GZipMiddleware):
+    """GZip responses, except the content types listed in _UNCOMPRESSED_CONTENT_TYPES."""
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = _ContentTypeGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+# Job search JSON is repetitive and compresses well; skip tiny responses
+app.add_middleware(StreamAwareGZipMiddleware, minimum_size=1024)
+
 # Include routers
 app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
 app.include_router(optimize.router, prefix="/api/optimize", tags=["optimize"])
 
-# Ping endpoint
+# Ping endpoint, also served at the root for uptime checks
 @app.get("/api/ping")
+@app.get("/ping")
 async def ping():
     return {"status": "ok", "timestamp": int(time.time())}
 
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=200,
         content={
             "status": "healthy",
@@ -65,10 +117,6 @@ async def health_check():
     )
 
 # Root endpoint
-@app.get("/ping")
-async def ping():
-    return {"status": "ok", "timestamp": int(time.time())}
-
 @app.get("/")
 async def root():
     return {"message": "LinkedIn Resume Optimizer API is running"}
@@ -76,17 +124,18 @@ async def root():
 # Error handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "detail": str(exc.detail),
             "status_code": exc.status_code
-        }
+        },
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "detail": f"Internal server error: {str(exc)}",
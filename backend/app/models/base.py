@@ -1,7 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 
+# Upper bound for free text fields; lets validation reject oversized bodies early
+MAX_TEXT_LENGTH = 100_000
+
 class JobDescription(BaseModel):
     job_id: str
     title: str
@@ -29,8 +32,8 @@ class JobSearchResponse(BaseModel):
     has_more: bool
 
 class ResumeOptimizationRequest(BaseModel):
-    resume_text: str
-    job_description: str
+    resume_text: str = Field(..., max_length=MAX_TEXT_LENGTH)
+    job_description: str = Field(..., max_length=MAX_TEXT_LENGTH)
     preserve_format: Optional[bool] = False
 
 class ResumeOptimizationResponse(BaseModel):
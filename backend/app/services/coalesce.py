@@ -0,0 +1,27 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+# Calls currently in progress, keyed by what they fetch
+_inflight: Dict[str, asyncio.Future] = {}
+
+def _finish(key: str, future: asyncio.Future) -> None:
+    """Forget a finished call and mark its exception as retrieved."""
+    if _inflight.get(key) is future:
+        del _inflight[key]
+    if not future.cancelled():
+        future.exception()  # Nobody may be left waiting once every caller was cancelled
+
+async def get_or_create_future(key: str, coro_factory: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run coro_factory() once per key at a time.
+    Concurrent callers with the same key await the same result
+    instead of starting their own upstream request.
+    """
+    future = _inflight.get(key)
+    if future is None:
+        # The work runs in its own task, so cancelling whichever caller started it
+        # only stops that caller waiting; the others still get the result
+        future = asyncio.ensure_future(coro_factory())
+        _inflight[key] = future
+        future.add_done_callback(lambda done: _finish(key, done))
+    return await asyncio.shield(future)
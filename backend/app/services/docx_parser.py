@@ -0,0 +1,273 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import posixpath
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import IO, Callable, Dict, List, Optional, Set, TypeVar, Union
+import docx
+from lxml import etree
+from rapidfuzz import fuzz, process, utils
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_PPR = f'{_W}pPr'
+_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+
+# Words that mark an achievement bullet in a resume
+_ACTION_WORDS = frozenset({
+    'increased', 'decreased', 'improved', 'achieved', 'launched',
+    'created', 'developed', 'implemented', 'managed', 'led'
+})
+_MONTHS = frozenset({
+    'January', 'February', 'March', 'April', 'May', 'June', 'July',
+    'August', 'September', 'October', 'November', 'December'
+})
+# One regex pass per paragraph instead of a substring scan per word
+_ACTION_RE = re.compile(r'\b(?:' + '|'.join(sorted(_ACTION_WORDS)) + r')\b', re.IGNORECASE)
+_MONTH_PATTERN = r'\b(?:' + '|'.join(sorted(_MONTHS)) + r')\b'
+# A position line has a '|' separator and a month name, in either order
+_POSITION_RE = re.compile(r'\|.*?' + _MONTH_PATTERN + '|' + _MONTH_PATTERN + r'.*?\|', re.DOTALL)
+
+# Start of the bullet updates in the optimizer output
+_UPDATES_HEADER_RE = re.compile(r'^[^\S\n]*POSITION_UPDATES:[^\S\n]*$', re.MULTILINE)
+# A position line followed by its bullets, allowing blank lines in between
+_POSITION_BLOCK_RE = re.compile(
+    r'^[^\S\n]*(?!-)(\S.*)\n'
+    r'((?:[^\S\n]*\n)*[^\S\n]*-.*(?:\n[^\S\n]*(?=-|\n|$)(?:-.*)?)*)',
+    re.MULTILINE
+)
+
+# Minimum similarity (0-100) for a resume title to take an update meant for a differently written title.
+# High enough that "Software Engineer I" vs "II" style pairs only match when nothing else competes.
+_POSITION_MATCH_CUTOFF = 92
+# A fuzzy match is refused when the runner-up scores within this many points of the best
+_POSITION_MATCH_MARGIN = 5
+
+# Worker processes for DOCX parsing, which is CPU-bound and would block the event loop
+_pool: Optional[ProcessPoolExecutor] = None
+
+T = TypeVar('T')
+
+def get_docx_pool() -> ProcessPoolExecutor:
+    """Get the shared DOCX worker pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        # Workers start lazily, after the app has gRPC and resolver threads running, which fork would copy
+        _pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _pool
+
+async def run_in_docx_pool(func: Callable[..., T], *args) -> T:
+    """
+    Run func in the DOCX worker pool.
+    A worker that dies (out of memory, a zip bomb) breaks the whole pool, so it is
+    replaced for later requests and the failure is raised for this one.
+    """
+    pool = get_docx_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        global _pool
+        if _pool is pool:  # Only the first caller to notice replaces it
+            _pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+        raise
+
+def shutdown_docx_pool() -> None:
+    """Stop the DOCX worker pool if it was created."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+    _pool = None
+
+def _main_document_path(archive: zipfile.ZipFile) -> str:
+    """Find the main document part, which is almost always word/document.xml."""
+    try:
+        rels = etree.fromstring(archive.read('_rels/.rels'))
+    except KeyError:
+        return 'word/document.xml'
+    for rel in rels.iter(f'{_PKG_REL}Relationship'):
+        if rel.get('Type') == _OFFICE_DOCUMENT:
+            return posixpath.normpath(rel.get('Target', '').lstrip('/'))
+    return 'word/document.xml'
+
+def _paragraph_text(paragraph) -> str:
+    """Text of a <w:p>, matching python-docx's Paragraph.text."""
+    parts = []
+    for child in paragraph.iterchildren(f'{_W}r', f'{_W}hyperlink'):
+        runs = (child,) if child.tag == f'{_W}r' else child.iterchildren(f'{_W}r')
+        for run in runs:
+            for node in run:
+                tag = node.tag
+                if tag == f'{_W}t':
+                    parts.append(node.text or '')
+                elif tag in (f'{_W}tab', f'{_W}ptab'):
+                    parts.append('\t')
+                elif tag == f'{_W}br':
+                    if node.get(f'{_W}type', 'textWrapping') == 'textWrapping':
+                        parts.append('\n')
+                elif tag == f'{_W}cr':
+                    parts.append('\n')
+                elif tag == f'{_W}noBreakHyphen':
+                    parts.append('-')
+    return ''.join(parts)
+
+def read_main_document(source: Union[bytes, IO[bytes]]) -> bytes:
+    """Read only the main document XML from a DOCX file, skipping images and other parts."""
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    with zipfile.ZipFile(source) as archive:
+        return archive.read(_main_document_path(archive))
+
+def extract_document_text(document_xml: bytes) -> str:
+    """
+    Extract the non-empty body paragraphs of word/document.xml, one per line.
+    Streams the XML instead of building python-docx's full object model.
+    """
+    lines = []
+    for _, paragraph in etree.iterparse(io.BytesIO(document_xml), events=('end',), tag=f'{_W}p'):
+        parent = paragraph.getparent()
+        # Only top-level body paragraphs, like docx.Document().paragraphs
+        if parent is None or parent.tag != f'{_W}body':
+            continue
+
+        text = _paragraph_text(paragraph)
+        if text.strip():
+            lines.append(text)
+
+        # Drop parsed content we no longer need
+        paragraph.clear()
+        while paragraph.getprevious() is not None:
+            del parent[0]
+    return "\n".join(lines)
+
+def extract_resume_text(source: Union[bytes, IO[bytes]]) -> str:
+    """Extract the non-empty body paragraphs of a DOCX file, one per line."""
+    return extract_document_text(read_main_document(source))
+
+def _parse_position_updates(suggestions: str) -> Dict[str, List[str]]:
+    """Parse the POSITION_UPDATES section of the optimizer output."""
+    position_updates = {}
+    header = _UPDATES_HEADER_RE.search(suggestions)
+    if header is None:
+        return position_updates
+
+    # Repeated header lines are skipped like blank lines rather than read as position titles
+    updates = _UPDATES_HEADER_RE.sub('', suggestions[header.end():])
+
+    # Each match is the last non-bullet line before a run of bullets
+    for match in _POSITION_BLOCK_RE.finditer(updates):
+        bullets = position_updates.setdefault(match.group(1).strip(), [])
+        for line in match.group(2).split('\n'):
+            line = line.strip()
+            if line:
+                bullets.append(line[1:].strip())
+
+    return position_updates
+
+def _match_position(position_key: str, updates_index: Dict[str, List[str]], reserved: Set[str]) -> Optional[str]:
+    """
+    Find the updates title for a resume position title, tolerating small wording differences.
+    Exact titles are a dict hit. Otherwise the closest title above the cutoff is used, unless
+    another resume position has exactly that title or a runner-up scores nearly as well;
+    an update left unapplied is better than one written into the wrong role.
+    """
+    if position_key in updates_index:
+        return position_key
+
+    candidates = [key for key in updates_index if key not in reserved]
+    if not candidates:
+        return None
+
+    ranked = process.extract(
+        position_key,
+        candidates,
+        scorer=fuzz.token_sort_ratio,
+        processor=utils.default_process,  # Ignore case and punctuation such as dashes
+        limit=2
+    )
+    best_key, best_score, _ = ranked[0]
+    if best_score < _POSITION_MATCH_CUTOFF:
+        return None
+    if len(ranked) > 1 and best_score - ranked[1][1] < _POSITION_MATCH_MARGIN:
+        return None
+    return best_key
+
+def apply_position_updates(source_path: str, target_path: str, suggestions: str) -> None:
+    """
+    Rewrite the bullet points under each position with the suggested updates.
+    Runs in a worker process, so the document is passed by path rather than pickled.
+    """
+    doc = docx.Document(source_path)
+    position_updates = _parse_position_updates(suggestions)
+
+    # Index updates by normalised title so each position paragraph is one lookup
+    updates_index = {}
+    for update_position in position_updates:
+        updates_index.setdefault(update_position.split('|')[0].strip().lower(), []).append(update_position)
+
+    paragraphs = [(paragraph, paragraph.text.strip()) for paragraph in doc.paragraphs]
+    # Titles the resume itself uses are never handed to a differently titled position
+    resume_titles = {
+        text.split('|')[0].strip().lower()
+        for _, text in paragraphs
+        if text and _POSITION_RE.search(text) is not None
+    }
+
+    # Process document
+    in_position = False
+    current_bullets = []
+    bullet_index = 0
+
+    for paragraph, text in paragraphs:
+        if not text:
+            continue
+
+        # Check for position titles
+        is_position = _POSITION_RE.search(text) is not None
+
+        # Process position titles
+        if is_position:
+            position_key = text.split('|')[0].strip().lower()
+            matched_key = _match_position(position_key, updates_index, resume_titles)
+            if matched_key is not None:
+                # Each update goes to one position, so a matched title stops being a candidate
+                pending = updates_index[matched_key]
+                update_position = pending.pop(0)
+                if not pending:
+                    del updates_index[matched_key]
+                current_bullets = position_updates[update_position]
+                in_position = True
+                bullet_index = 0
+
+        # Update bullet points
+        if in_position and bullet_index < len(current_bullets):
+            if text.startswith('•') or _ACTION_RE.search(text):
+                # Preserve bullet point
+                bullet = '• ' if text.startswith('•') else ''
+                new_text = bullet + current_bullets[bullet_index].lstrip('• ')
+
+                runs = paragraph.runs  # Builds a new list from the XML on every access
+                if runs:
+                    # Rewrite the first run in place so it keeps its own formatting,
+                    # then drop everything else in the paragraph except its properties
+                    first = runs[0]
+                    first.text = new_text
+                    p = paragraph._p
+                    for child in list(p):
+                        if child is not first._r and child.tag != _PPR:
+                            p.remove(child)
+                else:
+                    paragraph.clear()
+                    paragraph.add_run(new_text)
+
+                bullet_index += 1
+
+    doc.save(target_path)
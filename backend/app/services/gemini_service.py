@@ -1,30 +1,200 @@
+import asyncio
+import hashlib
+import logging
 import os
-from typing import Optional
+import time
+from itertools import count
+from typing import AsyncIterator, Optional
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 import google.generativeai as genai
+from google.ai import generativelanguage as glm
+from google.api_core import exceptions as g_exc
+from google.generativeai import client as genai_client
 from fastapi import HTTPException
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+# Sampling settings shared by every optimization call
+_GENERATION_CONFIG = genai.types.GenerationConfig(
+    temperature=0.7,
+    max_output_tokens=2048,
+)
+
+# Filled in with str.format; built once instead of re-evaluating an f-string per call
+_PROMPT_TEMPLATE = """
+You are an expert resume optimization assistant. First analyze the job description to identify key requirements, and then optimize the resume content.
+
+Analyze the following:
+1. Key technical skills and requirements
+2. Required experience level
+3. Company values and culture fit
+4. Industry-specific terminology
+5. Desired achievements and metrics
+
+Then provide output in EXACTLY this format:
+
+ANALYSIS :
+[Brief analysis of key findings]
+[Brief summary of gaps]
+[A suggested new position Summary section matching the original length (±35 words)]
+
+POSITION_UPDATES:
+[Exact Position Title As Shown in Resume]
+[Exact Company & Dates As Shown in Resume]
+- [Optimized bullet point starting with action verb]
+- [Optimized bullet point with metrics]
+- [Optimized bullet point showing impact]
+
+Bullet Point Rules:
+   - Match original length (±10 words)
+   - Start with relevant action verbs from the job description
+   - Include metrics and quantifiable achievements
+   - Directly address job requirements
+   - ALLWAYS use keywords and terminology from the job posting
+   - Make achievements specific to the target role and if the skill is not mentioned create it based on the resume context.
+   - Limit to 3-4 most relevant bullets per position
+   - Maintain professional tone
+
+3. Position Rules:
+   - Focus on positions most relevant to job requirements
+   - Highlight transferable skills for different industries
+   - Keep exact company names and dates
+   - Emphasize recent experience aligned with role
+   - Maintain chronological order
+
+4. Language Rules:
+   - ALLWAYS mirror the job description's terminology
+   - Use industry-standard keywords
+   - Incorporate role-specific language
+   - Maintain technical accuracy
+   - Ensure natural, professional tone
+   - ALLWAYS use british english spelling
+
+Job Description:
+{job_description}
+
+{resume_block}
+"""
+_RESUME_BLOCK = 'Resume: {}'
+_NO_RESUME_BLOCK = 'Provide general optimization advice based on the job requirements.'
+
+# IDs only correlate responses for clients, so a counter avoids a getrandom syscall per request
+_id_counter = count()
+_pid = os.getpid()
+
+def _reset_id_source() -> None:
+    """Give a forked child (e.g. a preloaded gunicorn worker) its own pid and sequence."""
+    global _id_counter, _pid
+    _id_counter = count()
+    _pid = os.getpid()
+
+os.register_at_fork(after_in_child=_reset_id_source)
+
+def _next_id() -> str:
+    """Unique ID for this process: pid, sequence number and timestamp."""
+    return f"{_pid:x}-{next(_id_counter):x}-{time.time_ns():x}"
+
+# The SDK keeps one pooled gRPC client per process, but genai.configure() throws it away
+_configured_api_key: Optional[str] = None
+
+def configure_genai(api_key: str) -> None:
+    """Configure the Gemini SDK, skipping the reset when the key has not changed."""
+    global _configured_api_key
+    if api_key != _configured_api_key:
+        genai.configure(api_key=api_key)
+        _configured_api_key = api_key
+
+async def close_genai() -> None:
+    """Close the async Gemini channel if one was opened; the next call opens a fresh one."""
+    # The SDK keeps one async client per process and has no public way to close it
+    async_client = genai_client._client_manager.clients.pop("generative_async", None)
+    if async_client is not None:
+        await async_client.transport.close()
+
+def content_key(job_description: str, resume_text: Optional[str] = None) -> str:
+    """Stable hash of an optimization's inputs, usable across workers."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(job_description.encode())
+    h.update(b'\0')
+    h.update((resume_text or '').encode())
+    return h.hexdigest()
+
+def too_short(text: str, min_length: int = 50) -> bool:
+    """Whether text has fewer than min_length characters once stripped."""
+    # Only strip (and copy) the text when it is short or actually padded with whitespace
+    return not text or len(text) < min_length or (
+        (text[0].isspace() or text[-1].isspace()) and len(text.strip()) < min_length
+    )
+
+# Seconds a client is told to wait once Gemini quota retries are exhausted
+_QUOTA_RETRY_AFTER = 30
+
+def upstream_error(error: Exception) -> HTTPException:
+    """HTTP error for a failed Gemini call, keeping retryable conditions distinguishable."""
+    if isinstance(error, g_exc.ResourceExhausted):
+        return HTTPException(
+            status_code=429,
+            detail="Resume optimization is over its Gemini quota. Please try again shortly.",
+            headers={"Retry-After": str(_QUOTA_RETRY_AFTER)}
+        )
+    if isinstance(error, g_exc.DeadlineExceeded):
+        return HTTPException(
+            status_code=504,
+            detail="Resume optimization timed out"
+        )
+    return HTTPException(
+        status_code=500,
+        detail=f"Resume optimization failed: {str(error)}"
+    )
+
 class GeminiService:
     def __init__(self):
         api_key = os.getenv('GEMINI_API_KEY')
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable is not set")
 
-        genai.configure(api_key=api_key)
+        configure_genai(api_key)
         self.client = genai.GenerativeModel('gemini-2.0-flash')
+        # Identical inputs produce interchangeable suggestions, so reuse them for a day
+        self._cache: TTLCache = TTLCache(maxsize=1024, ttl=86400)
+
+    async def warm_up(self, timeout: float = 5.0) -> None:
+        """
+        Open the async Gemini channel before the first request, so its TLS handshake is off the critical path.
+        Uses count_tokens, which costs no generation quota; failures are only logged.
+        """
+        # The model's own count_tokens_async goes through the sync client in this SDK version,
+        # so call the shared async client that generate_content_async uses
+        async_client = genai_client.get_default_generative_async_client()
+        try:
+            await asyncio.wait_for(
+                async_client.count_tokens(
+                    model=self.client.model_name,
+                    contents=[glm.Content(parts=[glm.Part(text="ping")])]
+                ),
+                timeout=timeout
+            )
+        except Exception as e:
+            logger.warning("Gemini warm-up failed: %s", e)
 
     def _validate_text(self, text: str, field_name: str, min_length: int = 50) -> None:
         """Validate text input."""
-        if not text or len(text.strip()) < min_length:
+        if too_short(text, min_length):
             raise HTTPException(
                 status_code=400,
                 detail=f"{field_name} is too short or empty"
             )
 
+    def _build_prompt(self, job_description: str, resume_text: Optional[str] = None) -> str:
+        """Build the optimization prompt for a job description and optional resume."""
+        resume_block = _RESUME_BLOCK.format(resume_text) if resume_text else _NO_RESUME_BLOCK
+        return _PROMPT_TEMPLATE.format(job_description=job_description, resume_block=resume_block)
+
     async def optimize_resume(self, job_description: str, resume_text: Optional[str] = None) -> str:
         """
         Optimize resume based on job description using Gemini Pro.
@@ -34,69 +204,17 @@ class GeminiService:
             if resume_text:
                 self._validate_text(resume_text, "Resume text")
 
-            prompt = f"""
-            You are an expert resume optimization assistant. First analyze the job description to identify key requirements, and then optimize the resume content.
-
-            Analyze the following:
-            1. Key technical skills and requirements
-            2. Required experience level
-            3. Company values and culture fit
-            4. Industry-specific terminology
-            5. Desired achievements and metrics
-
-            Then provide output in EXACTLY this format:
-
-            ANALYSIS :
-            [Brief analysis of key findings]
-            [Brief summary of gaps]
-            [A suggested new position Summary section matching the original length (±35 words)]
-
-            POSITION_UPDATES:
-            [Exact Position Title As Shown in Resume]
-            [Exact Company & Dates As Shown in Resume]
-            - [Optimized bullet point starting with action verb]
-            - [Optimized bullet point with metrics]
-            - [Optimized bullet point showing impact]
-            
-            Bullet Point Rules:
-               - Match original length (±10 words)
-               - Start with relevant action verbs from the job description
-               - Include metrics and quantifiable achievements
-               - Directly address job requirements
-               - ALLWAYS use keywords and terminology from the job posting
-               - Make achievements specific to the target role and if the skill is not mentioned create it based on the resume context.
-               - Limit to 3-4 most relevant bullets per position
-               - Maintain professional tone
-
-            3. Position Rules:
-               - Focus on positions most relevant to job requirements
-               - Highlight transferable skills for different industries
-               - Keep exact company names and dates
-               - Emphasize recent experience aligned with role
-               - Maintain chronological order
-
-            4. Language Rules:
-               - ALLWAYS mirror the job description's terminology
-               - Use industry-standard keywords
-               - Incorporate role-specific language
-               - Maintain technical accuracy
-               - Ensure natural, professional tone
-               - ALLWAYS use british english spelling
-
-            Job Description:
-            {job_description}
-
-            {f'Resume: {resume_text}' if resume_text else 'Provide general optimization advice based on the job requirements.'}
-            """
+            cache_key = content_key(job_description, resume_text)
+            cached = self._cache.get(cache_key)
+            if cached:
+                return cached
+
+            prompt = self._build_prompt(job_description, resume_text)
 
             # Generate optimization content
-            generation_config = genai.types.GenerationConfig(
-                temperature=0.7,
-                max_output_tokens=2048,
-            )
-            response = self.client.generate_content(
+            response = await self.client.generate_content_async(
                 prompt,
-                generation_config=generation_config
+                generation_config=_GENERATION_CONFIG
             )
             if not response:
                 raise ValueError("No response received from Gemini")
@@ -105,20 +223,56 @@ class GeminiService:
             if not optimized_content or len(optimized_content) < 50:
                 raise ValueError("Invalid optimization result received")
 
+            self._cache[cache_key] = optimized_content
             return optimized_content
 
+        except HTTPException:
+            raise
         except ValueError as e:
-            print(f"Gemini validation error: {str(e)}")  # Add logging for debugging
+            logger.warning("Gemini validation error: %s", e)
             raise HTTPException(
                 status_code=400,
                 detail=str(e)
             )
         except Exception as e:
-            print(f"Gemini service error: {str(e)}")  # Add logging for debugging
-            raise HTTPException(
-                status_code=500,
-                detail=f"Resume optimization failed: {str(e)}"
+            logger.error("Gemini service error: %s", e)
+            raise upstream_error(e)
+
+    def optimize_resume_stream(self, job_description: str, resume_text: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream optimized resume text as Gemini generates it.
+        Inputs are validated right away so errors surface before a response starts.
+        """
+        self._validate_text(job_description, "Job description")
+        if resume_text:
+            self._validate_text(resume_text, "Resume text")
+        return self._stream_optimization(job_description, resume_text)
+
+    async def _stream_optimization(self, job_description: str, resume_text: Optional[str]) -> AsyncIterator[str]:
+        cache_key = content_key(job_description, resume_text)
+        cached = self._cache.get(cache_key)
+        if cached:
+            yield cached
+            return
+
+        try:
+            response = await self.client.generate_content_async(
+                self._build_prompt(job_description, resume_text),
+                generation_config=_GENERATION_CONFIG,
+                stream=True
             )
+            parts = []
+            async for chunk in response:
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield chunk.text
+        except Exception as e:
+            logger.error("Gemini streaming error: %s", e)
+            raise upstream_error(e)
+
+        optimized_content = "".join(parts).strip()
+        if len(optimized_content) >= 50:
+            self._cache[cache_key] = optimized_content
 
     async def process_optimization_request(self, resume_text: str, job_description: str) -> dict:
         """
@@ -136,7 +290,7 @@ class GeminiService:
             return {
                 "original_resume": resume_text,
                 "optimized_resume": optimized_content,
-                "optimization_id": os.urandom(8).hex(),
+                "optimization_id": _next_id(),
                 "created_at": datetime.now().isoformat(),
                 "changes_summary": "Resume optimized with job-specific keywords and achievements"
             }
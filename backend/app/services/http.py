@@ -0,0 +1,25 @@
+from typing import Optional
+import aiohttp
+
+# Shared session so repeated calls to the same host reuse TCP+TLS connections
+_session: Optional[aiohttp.ClientSession] = None
+
+def get_session() -> aiohttp.ClientSession:
+    """Get the shared HTTP session, creating it on first use."""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=64,
+            keepalive_timeout=75,
+            ttl_dns_cache=300
+        )
+        _session = aiohttp.ClientSession(connector=connector)
+    return _session
+
+async def close_session() -> None:
+    """Close the shared HTTP session if it was created."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
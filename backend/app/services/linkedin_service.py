@@ -1,130 +1,281 @@
 import asyncio
-from bs4 import BeautifulSoup
-import httpx
+import aiohttp
+import io
+import logging
+from cachetools import TTLCache
+from lxml import etree
+from starlette.concurrency import run_in_threadpool
 import re
-import time
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from urllib.parse import quote
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Tuple, TypeVar, Union
+from urllib.parse import urlsplit
 from app.models.base import JobSearchRequest, JobSearchResponse, JobDescription
+from app.services import http
+from app.services.rate_limit import linkedin_admission, linkedin_bucket
 
-class CacheEntry:
-    def __init__(self, data, timestamp):
-        self.data = data
-        self.timestamp = timestamp
-        self.access_count = 0
-        self.last_access = timestamp
-
-    def is_valid(self, ttl_seconds: int = 300):  # 5 minutes TTL
-        now = datetime.now()
-        age = (now - self.timestamp).total_seconds()
-        
-        # Extend TTL based on access frequency and recency
-        if self.access_count > 10:
-            ttl_seconds *= 2
-        if (now - self.last_access).total_seconds() < 60:
-            ttl_seconds *= 1.5
-            
-        return age < ttl_seconds
-    
-    def access(self):
-        self.access_count += 1
-        self.last_access = datetime.now()
-
-class RateLimiter:
-    def __init__(self, calls: int, period: int):
-        self.calls = calls
-        self.period = period
-        self.timestamps = []
-
-    async def acquire(self):
-        now = time.time()
-        self.timestamps = [t for t in self.timestamps if now - t <= self.period]
-        
-        if len(self.timestamps) >= self.calls:
-            sleep_time = self.timestamps[0] + self.period - now
-            if sleep_time > 0:
-                await asyncio.sleep(sleep_time)
-        
-        self.timestamps.append(now)
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Pages below this size are parsed on the event loop; anything larger goes to a thread
+_INLINE_PARSE_MAX_BYTES = 50 * 1024
+
+# Class of the description div on a job page
+_DESCRIPTION_CLASS = 'description__text description__text--rich'
+# Elements whose text is not part of the page copy
+_NON_TEXT_TAGS = frozenset({'script', 'style', 'template'})
+
+def _class_step(tag: str, css_class: str) -> str:
+    """XPath step matching tag elements that carry css_class."""
+    return f"{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {css_class} ')]"
+
+# Search result cards are read with lxml directly, without building the whole page
+_CARD_CLASS = 'base-search-card__info'
+# Every field of a card in one query, in document order; the tag tells them apart
+_CARD_FIELDS_XPATH = etree.XPath(' | '.join((
+    './/h3',
+    './/' + _class_step('a', 'hidden-nested-link'),
+    './/' + _class_step('span', 'job-search-card__location'),
+    './/' + _class_step('time', 'job-search-card__listdate')
+)))
+_JOB_URL = 'https://www.linkedin.com/jobs/view/%s'
+
+def _iter_cards(body: bytes, encoding: str) -> Iterator[Tuple[str, etree._Element]]:
+    """
+    Yield (job_id, info div) for each search card as soon as it is parsed.
+    The job ID comes from the card's data-entity-urn, read once here, and cards
+    without one are skipped before any field lookups. Cards are cleared once the
+    caller is done with them, so memory stays flat however many results the page holds.
+    """
+    events = etree.iterparse(
+        io.BytesIO(body), events=('end',), tag='div',
+        html=True, recover=True, encoding=encoding
+    )
+    try:
+        for _, element in events:
+            if _CARD_CLASS not in (element.get('class') or '').split():
+                continue
+            parent = element.getparent()
+            if parent is None:
+                continue
+
+            job_id = parent.get('data-entity-urn', '').rpartition(':')[2]
+            if job_id:
+                yield job_id, element
+
+            element.clear()
+            # Detach everything parsed before this card at every level, earlier cards included
+            node = element
+            while node is not None:
+                while node.getprevious() is not None:
+                    del node.getparent()[0]
+                node = node.getparent()
+    except etree.XMLSyntaxError:
+        return  # Empty or unparseable page
+
+def _find_description(body: bytes, encoding: str) -> Optional[etree._Element]:
+    """Parse a job page only as far as the end of its description div."""
+    events = etree.iterparse(
+        io.BytesIO(body), events=('end',), tag='div',
+        html=True, recover=True, encoding=encoding
+    )
+    try:
+        for _, element in events:
+            if ' '.join((element.get('class') or '').split()) == _DESCRIPTION_CLASS:
+                return element
+    except etree.XMLSyntaxError:
+        pass  # Empty or unparseable page
+    return None
+
+def _collect_text(element: etree._Element, pieces: List[str], in_list: bool = False):
+    """Gather the text nodes under element in document order, marking list items."""
+    if element.text:
+        pieces.append(element.text)
+    for child in element:
+        tag = child.tag
+        # Comments and processing instructions have a non-str tag; only their tail is page text
+        if isinstance(tag, str) and tag not in _NON_TEXT_TAGS:
+            if tag == 'li' and in_list:
+                pieces.append('•')  # Mark bullet points
+            _collect_text(child, pieces, in_list or tag == 'ul')
+        if child.tail:
+            pieces.append(child.tail)
+
+async def _parse_off_loop(parse: Callable[[bytes, str], T], body: bytes, encoding: str) -> T:
+    """
+    Run a page parser in a worker thread so a large page does not stall the event loop.
+    Small bodies parse faster than the thread hop costs, so they stay inline.
+    """
+    if len(body) < _INLINE_PARSE_MAX_BYTES:
+        return parse(body, encoding)
+    return await run_in_threadpool(parse, body, encoding)
+
+def _node_text(node) -> str:
+    """Parsed element text with whitespace collapsed; it holds no markup, so no tag stripping."""
+    return ' '.join(''.join(node.itertext()).split())
+
+# LinkedIn search filter codes, keyed by the lowercased request value
+_JOB_TYPE_FILTERS = {
+    'full-time': 'F',
+    'part-time': 'P',
+    'contract': 'C',
+    'temporary': 'T',
+    'volunteer': 'V',
+    'internship': 'I'
+}
+_REMOTE_FILTERS = {
+    'remote': '2',
+    'on-site': '1',
+    'hybrid': '3'
+}
+_EXPERIENCE_LEVEL_FILTERS = {
+    'internship': '1',
+    'entry level': '2',
+    'associate': '3',
+    'senior': '4',
+    'director': '5',
+    'executive': '6'
+}
+_DATE_FILTERS = {
+    '24hr': 'r86400',
+    'past week': 'r604800',
+    'past month': 'r2592000'
+}
+
+# Used by _clean_text when a field still contains markup
+_TAG_RE = re.compile(r'<[^>]*?>')
+
+# LinkedIn pages are a few hundred KB; anything past this is not worth holding in memory
+_MAX_PAGE_BYTES = 2 * 1024 * 1024
+_READ_CHUNK_SIZE = 64 * 1024
+
+# Longest Retry-After we honour before retrying, so a request cannot hang for minutes
+_MAX_RETRY_AFTER = 60.0
+
+# Matches /jobs/view/<id> and slugged /jobs/view/<title>-<id>
+_JOB_VIEW_RE = re.compile(r'/jobs/view/(?:[^/]*-)?(\d+)(?:/|$)')
+
+def extract_job_id(url: str) -> str:
+    """
+    Get the numeric job ID from a LinkedIn job URL: the /jobs/view/ segment, or else a numeric last segment.
+    Raises ValueError when there is none, so arbitrary segments never become cache keys.
+    """
+    path = urlsplit(url).path
+    match = _JOB_VIEW_RE.search(path)
+    if match:
+        return match.group(1)
+    _, _, tail = path.rstrip('/').rpartition('/')
+    if not tail.isdigit():
+        raise ValueError("Invalid job ID in URL")
+    return tail
+
+def _retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), capped."""
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), _MAX_RETRY_AFTER)
+
+async def _read_capped(response: aiohttp.ClientResponse) -> Optional[bytes]:
+    """Read a response body, giving up (None) once it passes _MAX_PAGE_BYTES."""
+    if response.content_length is not None and response.content_length > _MAX_PAGE_BYTES:
+        return None
+    chunks = []
+    size = 0
+    async for chunk in response.content.iter_chunked(_READ_CHUNK_SIZE):
+        size += len(chunk)
+        if size > _MAX_PAGE_BYTES:
+            return None
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+class RateLimitError(Exception):
+    """LinkedIn kept answering 429 Too Many Requests after all retries."""
 
 class LinkedInService:
-    def __init__(self):
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        self._session = session
         self.base_url = "https://www.linkedin.com/jobs-guest/jobs/api/seeMoreJobPostings/search"
-        self.rate_limiter = RateLimiter(calls=30, period=60)  # 30 calls per minute
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
-        self._cache: Dict[str, CacheEntry] = {}
-        self._description_cache: Dict[str, CacheEntry] = {}
-        self._cleanup_task = asyncio.create_task(self._cache_cleanup())
+        # Bounded with a fixed 5 minute TTL, so no cleanup task is needed
+        self._cache: TTLCache = TTLCache(maxsize=1024, ttl=300)
+        # Descriptions rarely change, so keep hot ones for an hour
+        self._description_cache: TTLCache = TTLCache(maxsize=4096, ttl=3600)
 
-    async def _cache_cleanup(self):
-        """Periodically clean up expired cache entries"""
-        while True:
-            try:
-                await asyncio.sleep(300)  # Run every 5 minutes
-                now = datetime.now()
-                
-                # Clean search cache
-                expired_keys = [
-                    key for key, entry in self._cache.items()
-                    if (now - entry.timestamp).total_seconds() > 3600  # 1 hour max
-                ]
-                for key in expired_keys:
-                    del self._cache[key]
-                
-                # Clean description cache
-                expired_keys = [
-                    key for key, entry in self._description_cache.items()
-                    if (now - entry.timestamp).total_seconds() > 7200  # 2 hours max
-                ]
-                for key in expired_keys:
-                    del self._description_cache[key]
-                    
-            except Exception as e:
-                print(f"Cache cleanup error: {str(e)}")
-
-    def _get_cache(self, key: str, cache: Dict[str, CacheEntry] = None) -> Optional[any]:
-        """Get data from cache if it exists and is valid."""
-        cache = cache or self._cache
-        if key in cache and cache[key].is_valid():
-            cache[key].access()
-            return cache[key].data
-        return None
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Injected session, falling back to the app-wide shared one."""
+        return self._session or http.get_session()
+
+    def _get_cache(self, key: Tuple) -> Optional[JobSearchResponse]:
+        """Get a search result from cache if it has not expired."""
+        return self._cache.get(key)
 
-    def _set_cache(self, key: str, data: any, cache: Dict[str, CacheEntry] = None):
-        """Set data in cache with current timestamp."""
-        cache = cache or self._cache
-        cache[key] = CacheEntry(data, datetime.now())
+    def _set_cache(self, key: Tuple, data: JobSearchResponse):
+        """Cache a search result; TTLCache stamps it with a monotonic clock."""
+        self._cache[key] = data
 
-    async def _get_with_retry(self, url: str, retries: int = 3) -> Optional[BeautifulSoup]:
-        """Get URL content with smart retries."""
-        async with httpx.AsyncClient(headers=self.headers, timeout=30.0) as client:
-            for attempt in range(retries):
+    async def _fetch_with_retry(
+        self,
+        url: str,
+        retries: int = 3,
+        params: Optional[Dict[str, Union[str, int]]] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        """Get URL body and charset with smart retries."""
+        timeout = aiohttp.ClientTimeout(total=30.0)
+        retry_after = None
+        for attempt in range(retries):
+            try:
+                if attempt > 0:
+                    # The server's Retry-After when it sent one, else exponential backoff
+                    await asyncio.sleep(2 ** attempt if retry_after is None else retry_after)
+                    retry_after = None
+                    logger.debug("Retry attempt %d for URL: %s", attempt + 1, url)
+                    
+                # Paid per request that actually goes out, so cache hits cost nothing
+                await linkedin_bucket.acquire()
+                await linkedin_admission.acquire()
+                throttled = False
                 try:
-                    if attempt > 0:
-                        await asyncio.sleep(2 ** attempt)  # Exponential backoff
-                        print(f"Retry attempt {attempt + 1} for URL: {url}")
-                        
-                    response = await client.get(url)
-                    print(f"Response status: {response.status_code} for URL: {url}")
+                    async with self.session.get(url, params=params, headers=self.headers, timeout=timeout) as response:
+                        logger.debug("Response status: %s for URL: %s", response.status, url)
+                        linkedin_bucket.update_from_headers(response.headers)
                     
-                    if response.status_code == 200:
-                        return BeautifulSoup(response.content, 'html.parser')
-                    elif response.status_code == 404:
-                        return None
-                    elif response.status_code == 429:  # Rate limit hit
-                        if attempt < retries - 1:
-                            continue  # Try again with backoff
-                        return None  # Skip this job rather than fail
-                    else:
-                        if attempt == retries - 1:
-                            return None  # Skip problematic jobs on final attempt
-                        
-                except Exception:
-                    if attempt == retries - 1:
-                        return None  # Skip on final attempt instead of failing
+                        if response.status == 200:
+                            body = await _read_capped(response)
+                            if body is None:
+                                logger.warning("Skipping oversized response for URL: %s", url)
+                                return None
+                            return body, response.charset or 'utf-8'
+                        elif response.status == 404:
+                            return None
+                        elif response.status == 429:  # Rate limit hit
+                            throttled = True
+                            if attempt < retries - 1:
+                                retry_after = _retry_after(response.headers)
+                                continue  # Try again with backoff
+                            raise RateLimitError(f"Rate limited by LinkedIn for URL: {url}")
+                        else:
+                            if attempt == retries - 1:
+                                return None  # Skip problematic jobs on final attempt
+                finally:
+                    await linkedin_admission.release(throttled)
+                    
+            except RateLimitError:
+                raise
+            except Exception:
+                if attempt == retries - 1:
+                    return None  # Skip on final attempt instead of failing
                     
         return None
 
@@ -133,73 +284,87 @@ class LinkedInService:
         if not text:
             return ""
             
-        if hasattr(text, 'get_text'):
-            text = text.get_text()
-            
-        text = re.sub(r'<[^>]*?>', '', text)
-        text = re.sub(r'[\n\r\t]+', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
+        if '<' in text:
+            text = _TAG_RE.sub('', text)
+        # split() collapses every whitespace run and trims the ends in one C pass
+        return ' '.join(text.split())
+
+    def _parse_description(self, body: bytes, encoding: str) -> str:
+        """Get the description text of a job page."""
+        description_div = _find_description(body, encoding)
+        if description_div is None:
+            return ""
+
+        pieces = []
+        _collect_text(description_div, pieces)
+        # _clean_text collapses the whitespace, so the pieces need no stripping of their own
+        return self._clean_text(' '.join(pieces))
+
+    def _parse_cards(self, body: bytes, encoding: str) -> List[JobDescription]:
+        """Build jobs from a search results page."""
+        jobs = []
+        created_at = datetime.now().isoformat()  # One timestamp for the whole page
+        for job_id, item in _iter_cards(body, encoding):
+            try:
+                fields = {}
+                for node in _CARD_FIELDS_XPATH(item):
+                    fields.setdefault(node.tag, node)  # Keep the first of each, like find()
+                title_elem = fields.get('h3')
+                company_elem = fields.get('a')
+                location_elem = fields.get('span')
+                time_elem = fields.get('time')
+
+                if title_elem is None or company_elem is None:
+                    continue
+
+                jobs.append(JobDescription(
+                    job_id=job_id,
+                    title=_node_text(title_elem),
+                    company=_node_text(company_elem),
+                    location=_node_text(location_elem) if location_elem is not None else "",
+                    description="",
+                    url=_JOB_URL % job_id,  # No trailing slash
+                    ago_time=_node_text(time_elem) if time_elem is not None else None,
+                    created_at=created_at
+                ))
+            except Exception:
+                continue
+        return jobs
 
     async def search_jobs(self, request: JobSearchRequest) -> JobSearchResponse:
         """Search for jobs with pagination and caching."""
         try:
             start = int(request.page or 0) * 10  # Each page has 10 results
-            cache_key = f"{request.keywords}:{request.location}:{request.job_type}:{start}"
+            # Tuple of every value that shapes the query; no string formatting per call
+            cache_key = (
+                request.keywords, request.location, request.job_type,
+                request.remote_filter, request.experience_level, request.date_posted, start
+            )
             
             cached = self._get_cache(cache_key)
             if cached:
                 return cached
 
-            # Build search URL with all filters
-            url = f"{self.base_url}?keywords={quote(request.keywords)}&start={start}"
+            # Build search query with all filters; aiohttp encodes it in one pass
+            params = {'keywords': request.keywords, 'start': start}
             if request.location:
-                url += f"&location={quote(request.location)}"
+                params['location'] = request.location
             if request.job_type:
-                url += f"&f_JT={self._get_job_type_filter(request.job_type)}"
+                params['f_JT'] = self._get_job_type_filter(request.job_type)
             if request.remote_filter:
-                url += f"&f_WT={self._get_remote_filter(request.remote_filter)}"
+                params['f_WT'] = self._get_remote_filter(request.remote_filter)
             if request.experience_level:
-                url += f"&f_E={self._get_experience_level_filter(request.experience_level)}"
+                params['f_E'] = self._get_experience_level_filter(request.experience_level)
             if request.date_posted:
-                url += f"&f_TPR={self._get_date_filter(request.date_posted)}"
-            
-            await self.rate_limiter.acquire()
-            soup = await self._get_with_retry(url)
+                params['f_TPR'] = self._get_date_filter(request.date_posted)
             
-            if not soup:
-                return JobSearchResponse(jobs=[], total=0, has_more=False)
-            
-            divs = soup.find_all('div', class_='base-search-card__info')
-            if not divs:
+            fetched = await self._fetch_with_retry(self.base_url, params=params)
+            if not fetched:
                 return JobSearchResponse(jobs=[], total=0, has_more=False)
 
-            jobs = []
-            for item in divs:
-                try:
-                    title_elem = item.find('h3')
-                    company_elem = item.find('a', class_='hidden-nested-link')
-                    location_elem = item.find('span', class_='job-search-card__location')
-                    time_elem = item.find('time', class_='job-search-card__listdate')
-                    job_id = item.parent.get('data-entity-urn', '').split(':')[-1]
-
-                    if not all([title_elem, company_elem, job_id]):
-                        continue
-
-                    url = f'https://www.linkedin.com/jobs/view/{job_id}'  # Remove trailing slash
-
-                    jobs.append(JobDescription(
-                        job_id=job_id,
-                        title=self._clean_text(title_elem),
-                        company=self._clean_text(company_elem),
-                        location=self._clean_text(location_elem) if location_elem else "",
-                        description="",
-                        url=url,
-                        ago_time=self._clean_text(time_elem) if time_elem else None,
-                        created_at=datetime.now().isoformat()
-                    ))
-                except Exception:
-                    continue
+            jobs = await _parse_off_loop(self._parse_cards, *fetched)
+            if not jobs:
+                return JobSearchResponse(jobs=[], total=0, has_more=False)
 
             result = JobSearchResponse(
                 jobs=jobs,
@@ -210,86 +375,47 @@ class LinkedInService:
             self._set_cache(cache_key, result)
             return result
 
-        except Exception as e:
-            print(f"Error searching jobs: {str(e)}")
+        except RateLimitError:
+            raise
+        except Exception:
+            logger.exception("Error searching jobs")
             return JobSearchResponse(jobs=[], total=0, has_more=False)
 
     async def get_job_description(self, job_id: str) -> str:
         """Get description for a specific job ID with caching."""
         try:
-            cache_key = f"desc:{job_id}"
-            cached = self._get_cache(cache_key, self._description_cache)
+            # Remove any trailing slashes from job_id; the bare ID is the cache key
+            job_id = job_id.rstrip('/')
+            cached = self._description_cache.get(job_id)
             if cached:
                 return cached
 
-            # Remove any trailing slashes from job_id
-            job_id = job_id.rstrip('/')
             url = f"https://www.linkedin.com/jobs/view/{job_id}"
-            await self.rate_limiter.acquire()
             
-            soup = await self._get_with_retry(url)
-            if not soup:
+            fetched = await self._fetch_with_retry(url)
+            if not fetched:
                 return ""
 
-            description_div = soup.find('div', class_='description__text description__text--rich')
-            if not description_div:
-                return ""
-
-            # Clean nested elements
-            for element in description_div.find_all(['div', 'span', 'a']):
-                element.unwrap()
-                
-            # Handle bullet points
-            for ul in description_div.find_all('ul'):
-                for li in ul.find_all('li'):
-                    li.insert(0, '• ')
-                    li.unwrap()
-                ul.unwrap()
+            description = await _parse_off_loop(self._parse_description, *fetched)
             
-            text = description_div.get_text(separator='\n', strip=True)
-            description = self._clean_text(text)
-            
-            self._set_cache(cache_key, description, self._description_cache)
+            if description:
+                self._description_cache[job_id] = description
             return description
             
-        except Exception as e:
-            print(f"Error getting description: {str(e)}")
+        except RateLimitError:
+            raise
+        except Exception:
+            logger.exception("Error getting description")
             return ""
 
     def _get_job_type_filter(self, job_type: str) -> str:
-        filters = {
-            'full-time': 'F',
-            'part-time': 'P',
-            'contract': 'C',
-            'temporary': 'T',
-            'volunteer': 'V',
-            'internship': 'I'
-        }
-        return filters.get(job_type.lower(), '')
+        return _JOB_TYPE_FILTERS.get(job_type.lower(), '')
 
     def _get_remote_filter(self, remote_filter: str) -> str:
-        filters = {
-            'remote': '2',
-            'on-site': '1',
-            'hybrid': '3'
-        }
-        return filters.get(remote_filter.lower(), '')
+        return _REMOTE_FILTERS.get(remote_filter.lower(), '')
 
     def _get_experience_level_filter(self, experience_level: str) -> str:
-        filters = {
-            'internship': '1',
-            'entry level': '2',
-            'associate': '3',
-            'senior': '4',
-            'director': '5',
-            'executive': '6'
-        }
-        return filters.get(experience_level.lower(), '')
+        return _EXPERIENCE_LEVEL_FILTERS.get(experience_level.lower(), '')
 
     def _get_date_filter(self, date_posted: str) -> str:
-        filters = {
-            '24hr': 'r86400',
-            'past week': 'r604800',
-            'past month': 'r2592000'
-        }
-        return filters.get(date_posted.lower(), '')
+        return _DATE_FILTERS.get(date_posted.lower(), '')
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from typing import Mapping
+
+class TokenBucket:
+    """
+    Token bucket rate limiter for an upstream host.
+    Callers only wait once the burst capacity has been used up.
+    """
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate  # tokens added per second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Take one token, sleeping until it has been refilled if the bucket is empty."""
+        self._refill()
+        # Reserve the token now; a negative balance queues callers in arrival order
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return
+        try:
+            await asyncio.sleep(-self._tokens / self.rate)
+        except asyncio.CancelledError:
+            self._tokens += 1  # Hand the reservation back to the callers behind us
+            raise
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Adjust the refill rate from X-RateLimit-* response headers when present."""
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining = int(remaining)
+            reset = float(reset)
+        except ValueError:
+            return
+
+        # Reset may be an epoch timestamp or a number of seconds from now
+        window = reset - time.time() if reset > 1_000_000_000 else reset
+        if window <= 0:
+            return
+        self.rate = max(remaining / window, 0.01)
+        self._tokens = min(self._tokens, remaining)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Caps the requests in flight to an upstream host.
+    The cap halves whenever the host throttles us and creeps back up by one
+    after a cap's worth of clean responses; waiters re-check it under a
+    Condition, so it can change while they wait.
+    """
+    def __init__(self, limit: int, min_limit: int = 1):
+        self.max_limit = limit
+        self.min_limit = min_limit
+        self.limit = limit
+        self._in_flight = 0
+        self._successes = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        """Take a slot, waiting while the current limit is reached."""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+
+    async def release(self, throttled: bool = False):
+        """Give back a slot, shrinking the limit if the response was throttled."""
+        self._in_flight -= 1
+        if throttled:
+            self.limit = max(self.min_limit, self.limit // 2)
+            self._successes = 0
+        else:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+        # Shielded so waiters are still woken if the releasing task is being cancelled
+        await asyncio.shield(self._wake())
+
+    async def _wake(self):
+        async with self._cond:
+            self._cond.notify(max(self.limit - self._in_flight, 0))
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release()
+        return False
+
+# LinkedIn limits, applied per outgoing HTTP request (cache hits and coalesced callers are free):
+# - linkedin_bucket caps the request rate: 30 a minute, in bursts of at most 5
+linkedin_bucket = TokenBucket(rate=0.5, capacity=5)
+# - linkedin_admission caps requests in flight: 8, fewer while LinkedIn is answering 429
+linkedin_admission = AdaptiveConcurrencyLimiter(limit=8)
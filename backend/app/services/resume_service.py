@@ -1,7 +1,5 @@
 import os
-from typing import Optional
 import google.generativeai as genai
-import httpx
 from fastapi import HTTPException
 from dotenv import load_dotenv
 
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from app.services import coalesce
+from app.services.coalesce import get_or_create_future
+
+def test_concurrent_callers_share_one_call():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(get_or_create_future("key", fetch) for _ in range(3)))
+
+    assert asyncio.run(main()) == ["result"] * 3
+    assert len(calls) == 1
+    assert not coalesce._inflight
+
+def test_cancelling_the_first_caller_does_not_cancel_the_others():
+    calls = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def fetch():
+            calls.append(1)
+            await release.wait()
+            return "result"
+
+        leader = asyncio.create_task(get_or_create_future("key", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(get_or_create_future("key", fetch))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "result"
+    assert len(calls) == 1
+    assert not coalesce._inflight
+
+def test_failure_reaches_every_caller_and_is_not_cached():
+    async def fail():
+        await asyncio.sleep(0)
+        raise ValueError("upstream failed")
+
+    async def main():
+        return await asyncio.gather(
+            get_or_create_future("key", fail),
+            get_or_create_future("key", fail),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(main())
+    assert [type(r) for r in results] == [ValueError, ValueError]
+    assert not coalesce._inflight
@@ -0,0 +1,81 @@
+import docx
+
+from app.services.docx_parser import _match_position, apply_position_updates
+
+def _make_resume(*paragraphs: str) -> docx.Document:
+    doc = docx.Document()
+    for text in paragraphs:
+        doc.add_paragraph(text)
+    return doc
+
+def _apply(resume: docx.Document, suggestions: str, tmp_path) -> list:
+    source, target = tmp_path / "resume.docx", tmp_path / "optimized.docx"
+    resume.save(source)
+    apply_position_updates(str(source), str(target), suggestions)
+    return [p.text for p in docx.Document(target).paragraphs]
+
+def _suggestions(*blocks: str) -> str:
+    return "ANALYSIS:\n- Good fit\n\nPOSITION_UPDATES:\n" + "\n".join(blocks)
+
+def test_exact_title_gets_its_updates(tmp_path):
+    resume = _make_resume(
+        "Software Engineer | Acme | January 2020 - Present",
+        "• Developed internal tooling",
+    )
+    suggestions = _suggestions("Software Engineer | Acme | January 2020 - Present\n- Led a platform migration")
+
+    assert _apply(resume, suggestions, tmp_path)[1] == "• Led a platform migration"
+
+def test_update_for_one_level_is_not_written_into_a_neighbouring_level(tmp_path):
+    # "Software Engineer I" scores 97 against "II"; the II update belongs to the II position only
+    resume = _make_resume(
+        "Software Engineer I | Acme | January 2018 - December 2019",
+        "• Developed internal tooling",
+        "Software Engineer II | Acme | January 2020 - Present",
+        "• Managed the release process",
+    )
+    suggestions = _suggestions("Software Engineer II | Acme | January 2020 - Present\n- Led a platform migration")
+
+    assert _apply(resume, suggestions, tmp_path) == [
+        "Software Engineer I | Acme | January 2018 - December 2019",
+        "• Developed internal tooling",
+        "Software Engineer II | Acme | January 2020 - Present",
+        "• Led a platform migration",
+    ]
+
+def test_similar_but_different_role_is_not_matched(tmp_path):
+    # 86.7 with token_sort_ratio, below the cutoff
+    resume = _make_resume(
+        "Project Manager | Acme | January 2020 - Present",
+        "• Managed a team of five",
+    )
+    suggestions = _suggestions("Product Manager | Acme | January 2020 - Present\n- Launched three products")
+
+    assert _apply(resume, suggestions, tmp_path)[1] == "• Managed a team of five"
+
+def test_fuzzy_matched_update_is_applied_once(tmp_path):
+    resume = _make_resume(
+        "Backend Engineer. | Acme | January 2020 - Present",
+        "• Developed internal tooling",
+        "Backend Engineer, | Beta | March 2017 - December 2019",
+        "• Managed the release process",
+    )
+    suggestions = _suggestions("Backend Engineer | Acme | January 2020 - Present\n- Led a platform migration")
+
+    assert _apply(resume, suggestions, tmp_path)[1::2] == [
+        "• Led a platform migration",
+        "• Managed the release process",
+    ]
+
+def test_ambiguous_fuzzy_match_is_refused():
+    # 97.6 and 93.0: too close to tell which update was meant
+    updates_index = {"senior data engineers": ["a"], "senior data engineer ii": ["b"]}
+    assert _match_position("senior data engineer", updates_index, set()) is None
+
+def test_clear_fuzzy_match_is_accepted():
+    updates_index = {"senior data engineers": ["a"], "marketing lead": ["b"]}
+    assert _match_position("senior data engineer", updates_index, set()) == "senior data engineers"
+
+def test_title_used_by_another_resume_position_is_not_fuzzy_matched():
+    updates_index = {"software engineer ii": ["a"]}
+    assert _match_position("software engineer i", updates_index, {"software engineer i", "software engineer ii"}) is None